@@ -28,16 +28,26 @@ http://www.ahinson.com/algorithms_general/Sections/InterpolationRegression/Inter
 
 """
 
+from contextlib import contextmanager
+from functools import lru_cache
+
 import numpy as np
 from pyresample._spatial_mp import Proj
 import warnings
 
-from pyresample import kd_tree
+from pyresample import geometry, kd_tree
+
+try:
+    from pyresample.bilinear import _kernels
+except ImportError:
+    _kernels = None
 
 
 def resample_bilinear(data, source_geo_def, target_area_def, radius=50e3,
                       neighbours=32, nprocs=1, fill_value=0,
-                      reduce_data=True, segments=None, epsilon=0):
+                      reduce_data=True, segments=None, epsilon=0,
+                      precomputed=None, out=None, nthreads=None,
+                      cache=False):
     """Resample using bilinear interpolation.
 
     data : numpy array
@@ -53,7 +63,8 @@ def resample_bilinear(data, source_geo_def, target_area_def, radius=50e3,
         Number of neighbours to consider for each grid point when
         searching the closest corner points
     nprocs : int, optional
-        Number of processor cores to be used for getting neighbour info
+        Deprecated, use *nthreads* instead.  If *nthreads* isn't given,
+        this is used as the number of threads.
     fill_value : {int, None}, optional
         Set undetermined pixels to this value.
         If fill_value is None a masked array is returned with undetermined
@@ -67,6 +78,22 @@ def resample_bilinear(data, source_geo_def, target_area_def, radius=50e3,
     epsilon : float, optional
         Allowed uncertainty in meters. Increasing uncertainty
         reduces execution time
+    precomputed : tuple, optional
+        Resampling information (t__, s__, input_idxs, idx_ref) as
+        returned by :func:`get_bil_info`.  If not given, the information
+        is calculated.
+    out : numpy array, optional
+        C-contiguous array with the same size as the result where the
+        result is stored.  This can be used to re-use the same output
+        array for several resampling calls.
+    nthreads : int, optional
+        Number of threads used by the numba kernels.  By default the
+        numba setting is used.
+    cache : bool, optional
+        Keep the resampling information of the last few geometry pairs
+        in memory and re-use it in later calls with the same geometries
+        and parameters.  Only useful when the same source geometry is
+        resampled repeatedly, eg. for area definitions.
 
     Returns
     -------
@@ -74,29 +101,58 @@ def resample_bilinear(data, source_geo_def, target_area_def, radius=50e3,
         Source data resampled to target geometry
     """
 
+    nthreads = _check_nprocs(nprocs, nthreads)
+    with _num_threads(nthreads):
+        return _resample_bilinear(data, source_geo_def, target_area_def,
+                                  radius, neighbours, fill_value,
+                                  reduce_data, segments, epsilon,
+                                  precomputed, out, cache)
+
+
+def _resample_bilinear(data, source_geo_def, target_area_def, radius,
+                       neighbours, fill_value, reduce_data, segments,
+                       epsilon, precomputed, out, cache):
+    """Resample using bilinear interpolation."""
     # Calculate the resampling information
-    t__, s__, input_idxs, idx_ref = get_bil_info(source_geo_def,
-                                                 target_area_def,
-                                                 radius=radius,
-                                                 neighbours=neighbours,
-                                                 nprocs=nprocs,
-                                                 masked=False,
-                                                 reduce_data=reduce_data,
-                                                 segments=segments,
-                                                 epsilon=epsilon)
+    if precomputed is None and cache and _is_hashable(source_geo_def,
+                                                      target_area_def):
+        precomputed = _get_cached_bil_info(source_geo_def, target_area_def,
+                                           radius, neighbours, reduce_data,
+                                           segments, epsilon)
+    elif precomputed is None:
+        precomputed = get_bil_info(source_geo_def, target_area_def,
+                                   radius=radius, neighbours=neighbours,
+                                   masked=False,
+                                   reduce_data=reduce_data,
+                                   segments=segments, epsilon=epsilon)
+    t__, s__, input_idxs, idx_ref = precomputed
 
     data = _check_data_shape(data, input_idxs)
 
-    result = np.nan * np.zeros((target_area_def.size, data.shape[1]))
-    for i in range(data.shape[1]):
-        result[:, i] = get_sample_from_bil_info(data[:, i], t__, s__,
-                                                input_idxs, idx_ref,
-                                                output_shape=None)
+    shape = (target_area_def.size, data.shape[1])
+    if out is None:
+        # All the values are set in get_sample_from_bil_info()
+        result = np.empty(shape, dtype=np.result_type(data, t__))
+    elif not out.flags.c_contiguous:
+        raise ValueError("'out' needs to be C-contiguous")
+    else:
+        result = out.reshape(shape)
+    if not _use_numba(data, t__, s__, idx_ref):
+        for i in range(data.shape[1]):
+            get_sample_from_bil_info(data[:, i], t__, s__, input_idxs,
+                                     idx_ref, output_shape=None,
+                                     out=result[:, i])
+        if fill_value is not None:
+            result[np.isnan(result)] = fill_value
+    else:
+        # Interpolate all the channels at once, the kernel sets the
+        # invalid values directly to the fill value
+        _get_sample_numba(data, t__, s__, input_idxs, idx_ref, out=result,
+                          fill_value=np.nan if fill_value is None
+                          else fill_value)
 
     if fill_value is None:
         result = np.ma.masked_invalid(result)
-    else:
-        result[np.isnan(result)] = fill_value
 
     # Reshape to target area shape
     shp = target_area_def.shape
@@ -107,8 +163,35 @@ def resample_bilinear(data, source_geo_def, target_area_def, radius=50e3,
     return result
 
 
+def _is_hashable(*geo_defs):
+    """Check if the geometry definitions can be hashed for the cache."""
+    try:
+        for geo_def in geo_defs:
+            hash(geo_def)
+    except (TypeError, ValueError):
+        # Eg. non-contiguous coordinate arrays can't be hashed
+        return False
+    return True
+
+
+@lru_cache(maxsize=8)
+def _get_cached_bil_info(source_geo_def, target_area_def, radius, neighbours,
+                         reduce_data, segments, epsilon):
+    """Calculate the bilinear resampling information and cache it.
+
+    The geometry definitions are hashed based on their coordinates, so
+    the information is re-used for any pair of equal geometries.  The
+    returned arrays are shared between the calls and must not be
+    modified.
+    """
+    return get_bil_info(source_geo_def, target_area_def, radius=radius,
+                        neighbours=neighbours, masked=False,
+                        reduce_data=reduce_data, segments=segments,
+                        epsilon=epsilon)
+
+
 def get_sample_from_bil_info(data, t__, s__, input_idxs, idx_arr,
-                             output_shape=None):
+                             output_shape=None, out=None):
     """Resample data using bilinear interpolation.
 
     Parameters
@@ -126,6 +209,9 @@ def get_sample_from_bil_info(data, t__, s__, input_idxs, idx_arr,
     output_shape : tuple, optional
         Tuple of (y, x) dimension for the target projection.
         If None (default), do not reshape data.
+    out : numpy array, optional
+        Array with the same shape as *t__* where the result is stored.
+        If None (default), a new array is created.
 
     Returns
     -------
@@ -133,8 +219,25 @@ def get_sample_from_bil_info(data, t__, s__, input_idxs, idx_arr,
         Source data resampled to target geometry
     """
 
-    # Reduce data
-    new_data = data[input_idxs]
+    if not _use_numba(data, t__, s__, idx_arr):
+        # Reduce data
+        new_data = data[input_idxs]
+        result = _get_sample_numpy(new_data, t__, s__, idx_arr)
+        if out is not None:
+            out[...] = result
+            result = out
+    else:
+        result = _get_sample_numba(data, t__, s__, input_idxs, idx_arr,
+                                   out=out)
+
+    if output_shape is not None:
+        result = result.reshape(output_shape)
+
+    return result
+
+
+def _get_sample_numpy(new_data, t__, s__, idx_arr):
+    """Interpolate the reduced data using numpy."""
     # Add a small "machine epsilon" so that tiny variations are not discarded
     epsilon = 1e-6
     data_min = np.nanmin(new_data) - epsilon
@@ -148,10 +251,14 @@ def get_sample_from_bil_info(data, t__, s__, input_idxs, idx_arr,
     p_3 = new_data[:, 2]
     p_4 = new_data[:, 3]
 
-    result = (p_1 * (1 - s__) * (1 - t__) +
-              p_2 * s__ * (1 - t__) +
-              p_3 * (1 - s__) * t__ +
-              p_4 * s__ * t__)
+    # Calculate the weights once and accumulate in-place to avoid
+    # temporary arrays
+    one_minus_s = 1 - s__
+    one_minus_t = 1 - t__
+    result = p_1 * (one_minus_s * one_minus_t)
+    result += p_2 * (s__ * one_minus_t)
+    result += p_3 * (one_minus_s * t__)
+    result += p_4 * (s__ * t__)
 
     if hasattr(result, 'mask'):
         mask = result.mask
@@ -165,15 +272,77 @@ def get_sample_from_bil_info(data, t__, s__, input_idxs, idx_arr,
     except TypeError:
         pass
 
-    if output_shape is not None:
-        result = result.reshape(output_shape)
-
     return result
 
 
+def _get_sample_numba(data, t__, s__, input_idxs, idx_arr, out=None,
+                      fill_value=np.nan):
+    """Interpolate the data in a single pass using numba.
+
+    The data can have several channels on the second axis, these are
+    all interpolated in the same pass.  The reduced data isn't created,
+    the values are read directly from *data* through the positions of
+    the valid input locations.  Invalid values are set to *fill_value*.
+    """
+    if out is None:
+        out = np.empty(t__.shape + data.shape[1:],
+                       dtype=np.result_type(data, t__))
+    if data.ndim == 1:
+        data_2d, out_2d = data[:, np.newaxis], out[:, np.newaxis]
+    else:
+        data_2d, out_2d = data, out
+
+    valid_positions = np.flatnonzero(input_idxs)
+    data_min = np.empty(data_2d.shape[1])
+    data_max = np.empty(data_2d.shape[1])
+    for i in range(data_2d.shape[1]):
+        data_min[i], data_max[i] = _kernels.nanminmax(data_2d[:, i],
+                                                      valid_positions)
+    # Add a small "machine epsilon" so that tiny variations are not discarded
+    epsilon = 1e-6
+    _kernels.bilinear_kernel(data_2d, valid_positions, idx_arr, t__, s__,
+                             data_min - epsilon, data_max + epsilon,
+                             fill_value, out_2d)
+
+    return out
+
+
+def _check_nprocs(nprocs, nthreads):
+    """Warn about the deprecated *nprocs* and use it as the number of
+    threads if *nthreads* isn't given."""
+    if nprocs > 1:
+        warnings.warn("'nprocs' is deprecated, use 'nthreads' instead.",
+                      DeprecationWarning)
+        if nthreads is None:
+            nthreads = nprocs
+    return nthreads
+
+
+@contextmanager
+def _num_threads(nthreads):
+    """Use *nthreads* threads in the numba kernels within the context."""
+    if nthreads is None or _kernels is None:
+        yield
+    else:
+        with _kernels.num_threads(nthreads):
+            yield
+
+
+def _use_numba(*arrays):
+    """Check if the numba kernels can be used for the arrays.
+
+    The kernels need plain numeric arrays in native byte order, masked
+    arrays and other data are processed with numpy.
+    """
+    if _kernels is None:
+        return False
+    return all(not np.ma.isMaskedArray(arr) and arr.dtype.isnative and
+               arr.dtype.kind in 'biuf' for arr in arrays)
+
+
 def get_bil_info(source_geo_def, target_area_def, radius=50e3, neighbours=32,
                  nprocs=1, masked=False, reduce_data=True, segments=None,
-                 epsilon=0):
+                 epsilon=0, dtype=np.float64, nthreads=None):
     """Calculate information needed for bilinear resampling.
 
     source_geo_def : object
@@ -186,7 +355,8 @@ def get_bil_info(source_geo_def, target_area_def, radius=50e3, neighbours=32,
         Number of neighbours to consider for each grid point when
         searching the closest corner points
     nprocs : int, optional
-        Number of processor cores to be used for getting neighbour info
+        Deprecated, use *nthreads* instead.  If *nthreads* isn't given,
+        this is used as the number of threads.
     masked : bool, optional
         If true, return masked arrays, else return np.nan values for
         invalid points (default)
@@ -199,6 +369,16 @@ def get_bil_info(source_geo_def, target_area_def, radius=50e3, neighbours=32,
     epsilon : float, optional
         Allowed uncertainty in meters. Increasing uncertainty
         reduces execution time
+    dtype : numpy.dtype, optional
+        Floating point type used for the projection coordinates and the
+        returned fractional distances.  Using np.float32 halves the
+        memory use, but the fractional distances are accurate only to
+        about four decimals.  The result of get_sample_from_bil_info()
+        is float32 only if both the data and the fractional distances
+        are float32.
+    nthreads : int, optional
+        Number of threads used by the numba kernels.  By default the
+        numba setting is used.
 
     Returns
     -------
@@ -218,37 +398,46 @@ def get_bil_info(source_geo_def, target_area_def, radius=50e3, neighbours=32,
     #     lons, lats = _mask_coordinates(source_geo_def[0], source_geo_def[1])
     #     source_geo_def = SwathDefinition(lons, lats)
 
-    # Calculate neighbour information
+    nthreads = _check_nprocs(nprocs, nthreads)
+
+    # Calculate neighbour information.  No processes are forked for this,
+    # pykdtree queries are multi-threaded if it is built with OpenMP support
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
         (input_idxs, output_idxs, idx_ref, dists) = \
             kd_tree.get_neighbour_info(source_geo_def, target_area_def,
                                        radius, neighbours=neighbours,
-                                       nprocs=nprocs, reduce_data=reduce_data,
+                                       nprocs=1, reduce_data=reduce_data,
                                        segments=segments, epsilon=epsilon)
 
     del output_idxs, dists
 
-    # Reduce index reference
-    input_size = input_idxs.sum()
-    index_mask = (idx_ref == input_size)
-    idx_ref = np.where(index_mask, 0, idx_ref)
-
     # Get output projection as pyproj object
     proj = Proj(target_area_def.proj_str)
 
     # Get output x/y coordinates
     out_x, out_y = _get_output_xy(target_area_def, proj)
 
-    # Get input x/y coordinates
-    in_x, in_y = _get_input_xy(source_geo_def, proj, input_idxs, idx_ref)
+    with _num_threads(nthreads):
+        # Get input x/y coordinates
+        in_x, in_y = _get_input_xy(source_geo_def, proj, input_idxs, idx_ref)
+
+        out_x = out_x.astype(dtype, copy=False)
+        out_y = out_y.astype(dtype, copy=False)
+        in_x = in_x.astype(dtype, copy=False)
+        in_y = in_y.astype(dtype, copy=False)
 
-    # Get the four closest corner points around each output location
-    pt_1, pt_2, pt_3, pt_4, idx_ref = \
-        _get_bounding_corners(in_x, in_y, out_x, out_y, neighbours, idx_ref)
+        # Get the four closest corner points around each output location
+        x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4, idx_ref = \
+            _get_bounding_corners(in_x, in_y, out_x, out_y, neighbours,
+                                  idx_ref)
+        # Locations without any neighbours still refer to the NaN
+        # sentinel, so give them a valid index
+        idx_ref[idx_ref == input_idxs.sum()] = 0
 
-    # Calculate vertical and horizontal fractional distances t and s
-    t__, s__ = _get_ts(pt_1, pt_2, pt_3, pt_4, out_x, out_y)
+        # Calculate vertical and horizontal fractional distances t and s
+        t__, s__ = _get_ts(x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4,
+                           out_x, out_y)
 
     # Mask NaN values
     if masked:
@@ -259,90 +448,125 @@ def get_bil_info(source_geo_def, target_area_def, radius=50e3, neighbours=32,
     return t__, s__, input_idxs, idx_ref
 
 
-def _get_ts(pt_1, pt_2, pt_3, pt_4, out_x, out_y):
+def _get_ts(x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4, out_x, out_y):
     """Calculate vertical and horizontal fractional distances t and s"""
+    corners = (x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4)
+    if not _use_numba(out_x, out_y, *corners):
+        return _get_ts_numpy(x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4,
+                             out_x, out_y)
+
+    out_x = out_x.ravel()
+    out_y = out_y.ravel()
+    t__ = np.empty(out_x.shape, dtype=np.result_type(x_1, out_x))
+    s__ = np.empty_like(t__)
+    _kernels.get_ts(x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4, out_x, out_y,
+                    t__, s__)
 
-    # General case, ie. where the the corners form an irregular rectangle
-    t__, s__ = _get_ts_irregular(pt_1, pt_2, pt_3, pt_4, out_y, out_x)
+    return t__, s__
 
-    # Cases where verticals are parallel
-    idxs = np.isnan(t__) | np.isnan(s__)
-    # Remove extra dimensions
-    idxs = idxs.ravel()
 
-    if np.any(idxs):
-        t__[idxs], s__[idxs] = \
-            _get_ts_uprights_parallel(pt_1[idxs, :], pt_2[idxs, :],
-                                      pt_3[idxs, :], pt_4[idxs, :],
-                                      out_y[idxs], out_x[idxs])
+def _get_ts_numpy(x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4, out_x, out_y):
+    """Calculate vertical and horizontal fractional distances t and s
+    using numpy."""
 
-    # Cases where both verticals and horizontals are parallel
-    idxs = np.isnan(t__) | np.isnan(s__)
-    # Remove extra dimensions
-    idxs = idxs.ravel()
-    if np.any(idxs):
-        t__[idxs], s__[idxs] = \
-            _get_ts_parallellogram(pt_1[idxs, :], pt_2[idxs, :], pt_3[idxs, :],
-                                   out_y[idxs], out_x[idxs])
+    dtype = np.result_type(x_1, out_x)
+
+    # Use coordinates relative to the output location.  This doesn't
+    # change the solution, but keeps the products in the coefficients
+    # small.  The calculations are done in double precision also for
+    # 32-bit input coordinates.
+    out_x = out_x.ravel()
+    out_y = out_y.ravel()
+    x_1, x_2, x_3, x_4 = [np.subtract(x__, out_x, dtype=np.float64)
+                          for x__ in (x_1, x_2, x_3, x_4)]
+    y_1, y_2, y_3, y_4 = [np.subtract(y__, out_y, dtype=np.float64)
+                          for y__ in (y_1, y_2, y_3, y_4)]
+
+    # General case, ie. where the the corners form an irregular rectangle
+    t__, s__ = _get_ts_irregular(x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4,
+                                 0., 0.)
+
+    # Cases where verticals are parallel.  Typically there are none or
+    # only a few of these, so only the failed pixels are processed further.
+    idxs = np.flatnonzero(np.isnan(t__) | np.isnan(s__))
+    if idxs.size > 0:
+        t_sub, s_sub = _get_ts_uprights_parallel(x_1[idxs], y_1[idxs],
+                                                 x_2[idxs], y_2[idxs],
+                                                 x_3[idxs], y_3[idxs],
+                                                 x_4[idxs], y_4[idxs],
+                                                 0., 0.)
+
+        # Cases where both verticals and horizontals are parallel
+        sub_idxs = np.isnan(t_sub) | np.isnan(s_sub)
+        if np.any(sub_idxs):
+            idxs2 = idxs[sub_idxs]
+            t_sub[sub_idxs], s_sub[sub_idxs] = \
+                _get_ts_parallellogram(x_1[idxs2], y_1[idxs2],
+                                       x_2[idxs2], y_2[idxs2],
+                                       x_3[idxs2], y_3[idxs2],
+                                       0., 0.)
+        t__[idxs] = t_sub
+        s__[idxs] = s_sub
 
     with np.errstate(invalid='ignore'):
         idxs = (t__ < 0) | (t__ > 1) | (s__ < 0) | (s__ > 1)
     t__[idxs] = np.nan
     s__[idxs] = np.nan
 
-    return t__, s__
+    return t__.astype(dtype, copy=False), s__.astype(dtype, copy=False)
 
 
-def _get_ts_irregular(pt_1, pt_2, pt_3, pt_4, out_y, out_x):
+def _get_ts_irregular(x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4, out_y, out_x):
     """Get parameters for the case where none of the sides are parallel."""
 
     # Get parameters for the quadratic equation
-    a__, b__, c__ = _calc_abc(pt_1, pt_2, pt_3, pt_4, out_y, out_x)
+    a__, b__, c__ = _calc_abc(x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4,
+                              out_y, out_x)
 
     # Get the valid roots from interval [0, 1]
     t__ = _solve_quadratic(a__, b__, c__, min_val=0., max_val=1.)
 
     # Calculate parameter s
-    s__ = _solve_another_fractional_distance(t__, pt_1[:, 1], pt_3[:, 1],
-                                             pt_2[:, 1], pt_4[:, 1], out_y)
+    s__ = _solve_another_fractional_distance(t__, y_1, y_3, y_2, y_4, out_y)
 
     return t__, s__
 
 
-def _get_ts_uprights_parallel(pt_1, pt_2, pt_3, pt_4, out_y, out_x):
+def _get_ts_uprights_parallel(x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4,
+                              out_y, out_x):
     """Get parameters for the case where uprights are parallel"""
 
     # Get parameters for the quadratic equation
-    a__, b__, c__ = _calc_abc(pt_1, pt_3, pt_2, pt_4, out_y, out_x)
+    a__, b__, c__ = _calc_abc(x_1, y_1, x_3, y_3, x_2, y_2, x_4, y_4,
+                              out_y, out_x)
 
     # Get the valid roots from interval [0, 1]
     s__ = _solve_quadratic(a__, b__, c__, min_val=0., max_val=1.)
 
     # Calculate parameter t
-    t__ = _solve_another_fractional_distance(s__, pt_1[:, 1], pt_2[:, 1],
-                                             pt_3[:, 1], pt_4[:, 1], out_y)
+    t__ = _solve_another_fractional_distance(s__, y_1, y_2, y_3, y_4, out_y)
 
     return t__, s__
 
 
-def _get_ts_parallellogram(pt_1, pt_2, pt_3, out_y, out_x):
+def _get_ts_parallellogram(x_1, y_1, x_2, y_2, x_3, y_3, out_y, out_x):
     """Get parameters for the case where uprights are parallel"""
 
     # Pairwise longitudal separations between reference points
-    x_21 = pt_2[:, 0] - pt_1[:, 0]
-    x_31 = pt_3[:, 0] - pt_1[:, 0]
+    x_21 = x_2 - x_1
+    x_31 = x_3 - x_1
 
     # Pairwise latitudal separations between reference points
-    y_21 = pt_2[:, 1] - pt_1[:, 1]
-    y_31 = pt_3[:, 1] - pt_1[:, 1]
+    y_21 = y_2 - y_1
+    y_31 = y_3 - y_1
 
-    t__ = (x_21 * (out_y - pt_1[:, 1]) - y_21 * (out_x - pt_1[:, 0])) / \
+    t__ = (x_21 * (out_y - y_1) - y_21 * (out_x - x_1)) / \
           (x_21 * y_31 - y_21 * x_31)
     with np.errstate(invalid='ignore'):
         idxs = (t__ < 0.) | (t__ > 1.)
     t__[idxs] = np.nan
 
-    s__ = (out_x - pt_1[:, 0] + x_31 * t__) / x_21
+    s__ = (out_x - x_1 + x_31 * t__) / x_21
 
     with np.errstate(invalid='ignore'):
         idxs = (s__ < 0.) | (s__ > 1.)
@@ -357,47 +581,56 @@ def _solve_another_fractional_distance(f__, y_1, y_2, y_3, y_4, out_y):
     y_21 = y_2 - y_1
     y_43 = y_4 - y_3
 
-    with np.errstate(divide='ignore'):
-        g__ = ((out_y - y_1 - y_21 * f__) /
-               (y_3 + y_43 * f__ - y_1 - y_21 * f__))
+    denominator = y_3 + y_43 * f__ - y_1 - y_21 * f__
+    with np.errstate(divide='ignore', invalid='ignore'):
+        g__ = (out_y - y_1 - y_21 * f__) / denominator
 
-    # Limit values to interval [0, 1]
+    # Limit values to interval [0, 1].  The denominator is zero eg. for
+    # symmetric trapezoids, which are solved by the other solvers.
+    # Rounding can leave a tiny value instead of zero, so reject also
+    # values that are tiny compared to the coordinates.
     with np.errstate(invalid='ignore'):
-        idxs = (g__ < 0) | (g__ > 1)
+        idxs = ((g__ < 0) | (g__ > 1) |
+                (np.abs(denominator) <= 1e-10 * (np.abs(y_1) + np.abs(y_2) +
+                                                 np.abs(y_3) + np.abs(y_4))))
     g__[idxs] = np.nan
 
     return g__
 
 
-def _calc_abc(pt_1, pt_2, pt_3, pt_4, out_y, out_x):
+def _calc_abc(x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4, out_y, out_x):
     """Calculate coefficients for quadratic equation for
     _get_ts_irregular() and _get_ts_uprights().  For _get_ts_uprights
-    switch order of pt_2 and pt_3.
+    switch order of (x_2, y_2) and (x_3, y_3).
     """
     # Pairwise longitudal separations between reference points
-    x_21 = pt_2[:, 0] - pt_1[:, 0]
-    x_31 = pt_3[:, 0] - pt_1[:, 0]
-    x_42 = pt_4[:, 0] - pt_2[:, 0]
+    x_21 = x_2 - x_1
+    x_31 = x_3 - x_1
+    x_42 = x_4 - x_2
 
     # Pairwise latitudal separations between reference points
-    y_21 = pt_2[:, 1] - pt_1[:, 1]
-    y_31 = pt_3[:, 1] - pt_1[:, 1]
-    y_42 = pt_4[:, 1] - pt_2[:, 1]
+    y_21 = y_2 - y_1
+    y_31 = y_3 - y_1
+    y_42 = y_4 - y_2
 
     a__ = x_31 * y_42 - y_31 * x_42
     b__ = out_y * (x_42 - x_31) - out_x * (y_42 - y_31) + \
-        x_31 * pt_2[:, 1] - y_31 * pt_2[:, 0] + \
-        y_42 * pt_1[:, 0] - x_42 * pt_1[:, 1]
-    c__ = out_y * x_21 - out_x * y_21 + pt_1[:, 0] * pt_2[:, 1] - \
-        pt_2[:, 0] * pt_1[:, 1]
+        x_31 * y_2 - y_31 * x_2 + \
+        y_42 * x_1 - x_42 * y_1
+    c__ = out_y * x_21 - out_x * y_21 + x_1 * y_2 - x_2 * y_1
 
     return a__, b__, c__
 
 
 def _mask_coordinates(lons, lats):
     """Mask invalid coordinate values"""
-    lons = lons.ravel()
-    lats = lats.ravel()
+    # Integer coordinates can't hold NaN values
+    lons = _as_float(lons.ravel())
+    lats = _as_float(lats.ravel())
+    if _use_numba(lons, lats):
+        _kernels.mask_coordinates(lons, lats)
+        return lons, lats
+
     idxs = ((lons < -180.) | (lons > 180.) |
             (lats < -90.) | (lats > 90.))
     if hasattr(lons, 'mask'):
@@ -412,62 +645,92 @@ def _mask_coordinates(lons, lats):
     return lons, lats
 
 
-def _get_corner(stride, valid, in_x, in_y, idx_ref):
-    """Get closest set of coordinates from the *valid* locations"""
+def _as_float(arr):
+    """Convert non-floating point arrays to float64 and floating point
+    arrays to native byte order."""
+    if not np.issubdtype(arr.dtype, np.floating):
+        return arr.astype(np.float64)
+    if not arr.dtype.isnative:
+        return arr.astype(arr.dtype.newbyteorder('='))
+    return arr
+
+
+def _get_corner(stride, valid, in_x, in_y, idx_ref, x_out, y_out, idx_out):
+    """Get closest set of coordinates from the *valid* locations and
+    store them to *x_out*, *y_out* and *idx_out*"""
     # Find the closest valid pixels, if any
     idxs = np.argmax(valid, axis=1)
-    # Check which of these were actually valid
-    invalid = np.invert(np.max(valid, axis=1))
+    # Check which of these were actually valid.  The value at the argmax
+    # location tells this without another pass over all the neighbours.
+    invalid = np.invert(valid[stride, idxs])
 
+    x_out[:] = in_x[stride, idxs]
+    y_out[:] = in_y[stride, idxs]
     # Replace invalid points with np.nan
-    x__ = in_x[stride, idxs]
-    x__[invalid] = np.nan
-    y__ = in_y[stride, idxs]
-    y__[invalid] = np.nan
-    idx = idx_ref[stride, idxs]
-
-    return x__, y__, idx
+    x_out[invalid] = np.nan
+    y_out[invalid] = np.nan
+    # Missing corners get the index of the closest neighbour
+    idx_out[:] = idx_ref[stride, idxs]
 
 
 def _get_bounding_corners(in_x, in_y, out_x, out_y, neighbours, idx_ref):
     """Get four closest locations from (in_x, in_y) so that they form a
     bounding rectangle around the requested location given by (out_x,
     out_y).
+
+    The corner coordinates are returned as separate contiguous arrays
+    (x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4) followed by the (N, 4)
+    array of their indices.
     """
+    # The corners are stored to two arrays and returned as views to them
+    dtype = np.result_type(in_x, out_x)
+    corner_x = np.empty((4, out_x.size), dtype=dtype)
+    corner_y = np.empty((4, out_x.size), dtype=dtype)
+    idx_out = np.empty((out_x.size, 4), dtype=idx_ref.dtype)
+
+    if not _use_numba(in_x, in_y, out_x, out_y, idx_ref):
+        _get_bounding_corners_numpy(in_x, in_y, out_x, out_y, idx_ref,
+                                    corner_x, corner_y, idx_out)
+    else:
+        _kernels.get_bounding_corners(in_x, in_y, out_x, out_y, idx_ref,
+                                      corner_x, corner_y, idx_out)
+
+    return (corner_x[0], corner_y[0], corner_x[1], corner_y[1],
+            corner_x[2], corner_y[2], corner_x[3], corner_y[3], idx_out)
 
-    # Find four closest pixels around the target location
 
-    # Tile output coordinates to same shape as neighbour info
-    out_x_tile = np.tile(out_x, (neighbours, 1)).T
-    out_y_tile = np.tile(out_y, (neighbours, 1)).T
+def _get_bounding_corners_numpy(in_x, in_y, out_x, out_y, idx_ref,
+                                corner_x, corner_y, idx_out):
+    """Get the four bounding corner locations using numpy."""
 
-    # Get differences in both directions
-    x_diff = out_x_tile - in_x
-    y_diff = out_y_tile - in_y
+    # Find four closest pixels around the target location
+
+    # Get differences in both directions, broadcasting the output
+    # coordinates to the same shape as neighbour info
+    x_diff = out_x[:, np.newaxis] - in_x
+    y_diff = out_y[:, np.newaxis] - in_y
 
     stride = np.arange(x_diff.shape[0])
 
     # Upper left source pixel
     valid = (x_diff > 0) & (y_diff < 0)
-    x_1, y_1, idx_1 = _get_corner(stride, valid, in_x, in_y, idx_ref)
+    _get_corner(stride, valid, in_x, in_y, idx_ref,
+                corner_x[0], corner_y[0], idx_out[:, 0])
 
     # Upper right source pixel
     valid = (x_diff < 0) & (y_diff < 0)
-    x_2, y_2, idx_2 = _get_corner(stride, valid, in_x, in_y, idx_ref)
+    _get_corner(stride, valid, in_x, in_y, idx_ref,
+                corner_x[1], corner_y[1], idx_out[:, 1])
 
     # Lower left source pixel
     valid = (x_diff > 0) & (y_diff > 0)
-    x_3, y_3, idx_3 = _get_corner(stride, valid, in_x, in_y, idx_ref)
+    _get_corner(stride, valid, in_x, in_y, idx_ref,
+                corner_x[2], corner_y[2], idx_out[:, 2])
 
     # Lower right source pixel
     valid = (x_diff < 0) & (y_diff > 0)
-    x_4, y_4, idx_4 = _get_corner(stride, valid, in_x, in_y, idx_ref)
-
-    # Combine sorted indices to idx_ref
-    idx_ref = np.vstack((idx_1, idx_2, idx_3, idx_4)).T
-
-    return (np.vstack((x_1, y_1)).T, np.vstack((x_2, y_2)).T,
-            np.vstack((x_3, y_3)).T, np.vstack((x_4, y_4)).T, idx_ref)
+    _get_corner(stride, valid, in_x, in_y, idx_ref,
+                corner_x[3], corner_y[3], idx_out[:, 3])
 
 
 def _solve_quadratic(a__, b__, c__, min_val=0.0, max_val=1.0):
@@ -475,33 +738,29 @@ def _solve_quadratic(a__, b__, c__, min_val=0.0, max_val=1.0):
     [*min_val*, *max_val*]
 
     """
-
-    def int_and_float_to_numpy(val):
-        if not isinstance(val, np.ndarray):
-            if isinstance(val, (int, float)):
-                val = [val]
-            val = np.array(val)
-        return val
-
-    a__ = int_and_float_to_numpy(a__)
-    b__ = int_and_float_to_numpy(b__)
-    c__ = int_and_float_to_numpy(c__)
+    a__ = np.atleast_1d(a__)
+    b__ = np.atleast_1d(b__)
+    c__ = np.atleast_1d(c__)
 
     discriminant = b__ * b__ - 4 * a__ * c__
 
-    # Solve the quadratic polynomial
+    # Solve the quadratic polynomial using the numerically stable form,
+    # which avoids the cancellation between -b and the square root
     with np.errstate(invalid='ignore', divide='ignore'):
-        x_1 = (-b__ + np.sqrt(discriminant)) / (2 * a__)
-        x_2 = (-b__ - np.sqrt(discriminant)) / (2 * a__)
+        q__ = -0.5 * (b__ + np.copysign(np.sqrt(np.maximum(discriminant, 0)),
+                                        b__))
+        # x_1 is the root with the positive square root term
+        use_q = (b__ < 0) | (q__ == 0)
+        x_1 = np.where(use_q, q__ / a__, c__ / q__)
+        x_2 = np.where(use_q, c__ / q__, q__ / a__)
 
     # Find valid solutions, ie. 0 <= t <= 1
-    x__ = x_1.copy()
     with np.errstate(invalid='ignore'):
         idxs = (x_1 < min_val) | (x_1 > max_val)
-    x__[idxs] = x_2[idxs]
-
-    with np.errstate(invalid='ignore'):
-        idxs = (x__ < min_val) | (x__ > max_val)
+        x__ = np.where(idxs, x_2, x_1)
+        # The linear case (a == 0) is left to the special case solvers
+        idxs = ((discriminant < 0) | (a__ == 0) |
+                (x__ < min_val) | (x__ > max_val))
     x__[idxs] = np.nan
 
     return x__
@@ -509,6 +768,15 @@ def _solve_quadratic(a__, b__, c__, min_val=0.0, max_val=1.0):
 
 def _get_output_xy(target_area_def, proj):
     """Get x/y coordinates of the target grid."""
+    # Coordinates of an area definition are already in the target
+    # projection, but they can be used only if they are the same as the
+    # projected lon/lats.  This isn't the case eg. for areas crossing the
+    # antimeridian of the projection, as the input longitudes are wrapped.
+    if isinstance(target_area_def, geometry.AreaDefinition):
+        out_x, out_y = target_area_def.get_proj_coords()
+        if _is_unwrapped(out_x, out_y, proj):
+            return out_x.ravel(), out_y.ravel()
+
     # Read output coordinates
     out_lons, out_lats = target_area_def.get_lonlats()
 
@@ -525,6 +793,18 @@ def _get_output_xy(target_area_def, proj):
     return out_x, out_y
 
 
+def _is_unwrapped(out_x, out_y, proj):
+    """Check if the corners of the projection coordinates are preserved in a
+    round trip through lon/lat."""
+    if proj.is_latlong():
+        return False
+    corners_x = out_x[[0, 0, -1, -1], [0, -1, 0, -1]]
+    corners_y = out_y[[0, 0, -1, -1], [0, -1, 0, -1]]
+    lons, lats = proj(corners_x, corners_y, inverse=True)
+    x__, y__ = proj(lons, lats)
+    return np.allclose(x__, corners_x) and np.allclose(y__, corners_y)
+
+
 def _get_input_xy(source_geo_def, proj, input_idxs, idx_ref):
     """Get x/y coordinates for the input area and reduce the data."""
     in_lons, in_lats = source_geo_def.get_lonlats()
@@ -536,18 +816,21 @@ def _get_input_xy(source_geo_def, proj, input_idxs, idx_ref):
     # Mask invalid values
     in_lons, in_lats = _mask_coordinates(in_lons, in_lats)
 
-    # Expand input coordinates for each output location
-    in_lons = in_lons[idx_ref]
-    in_lats = in_lats[idx_ref]
-
     # Replace masked arrays with np.nan'd ndarrays
     in_lons = _convert_masks_to_nans(in_lons)
     in_lats = _convert_masks_to_nans(in_lats)
 
-    # Convert coordinates to output projection x/y space
+    # Convert coordinates to output projection x/y space.  This is done
+    # before expanding so that each input location is projected only once.
     in_x, in_y = proj(in_lons, in_lats)
 
-    return in_x, in_y
+    # Expand input coordinates for each output location.  Missing
+    # neighbours are referenced with the index after the last valid input
+    # location, so add a NaN sentinel at the end for them.
+    in_x = np.append(in_x, np.nan)
+    in_y = np.append(in_y, np.nan)
+
+    return in_x[idx_ref], in_y[idx_ref]
 
 
 def _convert_masks_to_nans(arr):
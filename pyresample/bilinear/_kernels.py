@@ -0,0 +1,255 @@
+"""Numba-compiled kernels for bilinear interpolation.
+
+Importing this module requires numba.  The functions here work on plain
+numpy arrays and write their results to preallocated output arrays.
+"""
+
+from contextlib import contextmanager
+
+import numpy as np
+from numba import config, get_num_threads, njit, prange, set_num_threads
+
+# NaN values are used for marking invalid data, so the fast-math flags
+# assuming there are no NaNs or infinities ('nnan' and 'ninf') can't be used
+FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+# Relative tolerance for denominators that should be exactly zero
+EPSILON = 1e-10
+
+
+def _jit(parallel=False):
+    """Compile a kernel.
+
+    The numpy error model is used so that division by zero results in
+    inf/NaN instead of raising an exception.
+    """
+    return njit(parallel=parallel, fastmath=FASTMATH, error_model='numpy',
+                cache=True)
+
+
+@contextmanager
+def num_threads(nthreads):
+    """Use *nthreads* threads in the parallel kernels within the context.
+
+    The number of threads is limited to the number of threads numba has
+    started, ie. the ``NUMBA_NUM_THREADS`` setting.
+    """
+    previous = get_num_threads()
+    set_num_threads(max(1, min(nthreads, config.NUMBA_NUM_THREADS)))
+    try:
+        yield
+    finally:
+        set_num_threads(previous)
+
+
+@_jit(parallel=True)
+def nanminmax(data, positions):
+    """Get the minimum and maximum of *data* at *positions* ignoring NaNs."""
+    data_min = np.inf
+    data_max = -np.inf
+    for i in prange(positions.size):
+        val = data[positions[i]]
+        if not np.isnan(val):
+            data_min = min(data_min, val)
+            data_max = max(data_max, val)
+    if data_min > data_max:
+        # All values were NaN
+        return np.nan, np.nan
+    return data_min, data_max
+
+
+@_jit(parallel=True)
+def bilinear_kernel(data, positions, idx_arr, t__, s__, data_min, data_max,
+                    fill_value, out):
+    """Interpolate *data* to *out* using the four corners in *idx_arr*.
+
+    The channels of *data* and *out* are on the second axis.  The corner
+    indices refer to the valid input locations, whose positions in
+    *data* are given in *positions*.  The weights are calculated once
+    for each output location and used for all the channels.
+    Interpolated values that are NaN or outside of [*data_min*,
+    *data_max*] of the channel are set to *fill_value*.  The data isn't
+    read at all for the locations without valid *t__* and *s__*.
+    """
+    for i in prange(idx_arr.shape[0]):
+        if np.isnan(t__[i]) or np.isnan(s__[i]):
+            for k in range(data.shape[1]):
+                out[i, k] = fill_value
+            continue
+        w_1 = (1 - s__[i]) * (1 - t__[i])
+        w_2 = s__[i] * (1 - t__[i])
+        w_3 = (1 - s__[i]) * t__[i]
+        w_4 = s__[i] * t__[i]
+        p_1 = positions[idx_arr[i, 0]]
+        p_2 = positions[idx_arr[i, 1]]
+        p_3 = positions[idx_arr[i, 2]]
+        p_4 = positions[idx_arr[i, 3]]
+        for k in range(data.shape[1]):
+            res = (data[p_1, k] * w_1 + data[p_2, k] * w_2 +
+                   data[p_3, k] * w_3 + data[p_4, k] * w_4)
+            if np.isnan(res) or res > data_max[k] or res < data_min[k]:
+                res = fill_value
+            out[i, k] = res
+
+
+@_jit(parallel=True)
+def mask_coordinates(lons, lats):
+    """Set coordinates outside of the valid lon/lat ranges to NaN in place."""
+    for i in prange(lons.size):
+        if (lons[i] < -180. or lons[i] > 180. or
+                lats[i] < -90. or lats[i] > 90.):
+            lons[i] = np.nan
+            lats[i] = np.nan
+
+
+@_jit(parallel=True)
+def get_bounding_corners(in_x, in_y, out_x, out_y, idx_ref,
+                         corner_x, corner_y, idx_out):
+    """Find the closest neighbours in each quadrant around the output pixels.
+
+    The corner coordinates are stored in *corner_x* and *corner_y* (shape
+    (4, N)) and their indices in *idx_out* (shape (N, 4)) in the order
+    upper left, upper right, lower left and lower right.  Corners that
+    are not found are set to NaN and get the index of the closest
+    neighbour.
+    """
+    for i in prange(in_x.shape[0]):
+        for k in range(4):
+            corner_x[k, i] = np.nan
+            corner_y[k, i] = np.nan
+            idx_out[i, k] = idx_ref[i, 0]
+        # Bit k is set when corner k has been found
+        found = 0
+        for j in range(in_x.shape[1]):
+            x_diff = out_x[i] - in_x[i, j]
+            y_diff = out_y[i] - in_y[i, j]
+            # Skip NaNs and points exactly on the axes
+            if not (x_diff > 0 or x_diff < 0) or not (y_diff > 0 or y_diff < 0):
+                continue
+            k = int(x_diff < 0) + 2 * int(y_diff > 0)
+            if found & (1 << k):
+                continue
+            found |= 1 << k
+            corner_x[k, i] = in_x[i, j]
+            corner_y[k, i] = in_y[i, j]
+            idx_out[i, k] = idx_ref[i, j]
+            if found == 15:
+                break
+
+
+@_jit(parallel=True)
+def get_ts(x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4, out_x, out_y,
+           t_out, s_out):
+    """Calculate vertical and horizontal fractional distances t and s.
+
+    The general case of an irregular quadrilateral is tried first.  If
+    that fails, the cases of parallel uprights and of a parallellogram
+    are tried, in this order.  Values outside of [0, 1] are set to NaN.
+    """
+    for i in prange(out_x.shape[0]):
+        # Use coordinates relative to the output location.  This doesn't
+        # change the solution, but keeps the products in the coefficients
+        # small.  The calculations are done in double precision also for
+        # 32-bit input coordinates.
+        o_x, o_y = np.float64(out_x[i]), np.float64(out_y[i])
+        x1, y1 = x_1[i] - o_x, y_1[i] - o_y
+        x2, y2 = x_2[i] - o_x, y_2[i] - o_y
+        x3, y3 = x_3[i] - o_x, y_3[i] - o_y
+        x4, y4 = x_4[i] - o_x, y_4[i] - o_y
+
+        # General case, ie. where the the corners form an irregular rectangle
+        a__, b__, c__ = _calc_abc(x1, y1, x2, y2, x3, y3, x4, y4, 0., 0.)
+        t__ = _solve_quadratic(a__, b__, c__, 0., 1.)
+        s__ = _solve_another_fractional_distance(t__, y1, y3, y2, y4, 0.)
+
+        # Cases where verticals are parallel
+        if np.isnan(t__) or np.isnan(s__):
+            a__, b__, c__ = _calc_abc(x1, y1, x3, y3, x2, y2, x4, y4, 0., 0.)
+            s__ = _solve_quadratic(a__, b__, c__, 0., 1.)
+            t__ = _solve_another_fractional_distance(s__, y1, y2, y3, y4, 0.)
+
+        # Cases where both verticals and horizontals are parallel
+        if np.isnan(t__) or np.isnan(s__):
+            t__, s__ = _get_ts_parallellogram(x1, y1, x2, y2, x3, y3, 0., 0.)
+
+        if t__ < 0. or t__ > 1. or s__ < 0. or s__ > 1.:
+            t__ = np.nan
+            s__ = np.nan
+        t_out[i] = t__
+        s_out[i] = s__
+
+
+@_jit()
+def _calc_abc(x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4, out_x, out_y):
+    """Calculate the coefficients of the quadratic equation for one pixel."""
+    x_21 = x_2 - x_1
+    x_31 = x_3 - x_1
+    x_42 = x_4 - x_2
+    y_21 = y_2 - y_1
+    y_31 = y_3 - y_1
+    y_42 = y_4 - y_2
+
+    a__ = x_31 * y_42 - y_31 * x_42
+    b__ = (out_y * (x_42 - x_31) - out_x * (y_42 - y_31) +
+           x_31 * y_2 - y_31 * x_2 + y_42 * x_1 - x_42 * y_1)
+    c__ = out_y * x_21 - out_x * y_21 + x_1 * y_2 - x_2 * y_1
+
+    return a__, b__, c__
+
+
+@_jit()
+def _solve_quadratic(a__, b__, c__, min_val, max_val):
+    """Solve the quadratic equation for the root within [min_val, max_val]."""
+    discriminant = b__ * b__ - 4 * a__ * c__
+    # The linear case (a == 0) is left to the special case solvers
+    if discriminant < 0 or a__ == 0:
+        return np.nan
+    # Numerically stable form, x_1 is the root of the positive square root
+    q__ = -0.5 * (b__ + np.copysign(np.sqrt(discriminant), b__))
+    if b__ < 0 or q__ == 0:
+        x_1, x_2 = q__ / a__, c__ / q__
+    else:
+        x_1, x_2 = c__ / q__, q__ / a__
+    x__ = x_1
+    if x_1 < min_val or x_1 > max_val:
+        x__ = x_2
+    if x__ < min_val or x__ > max_val:
+        return np.nan
+    return x__
+
+
+@_jit()
+def _solve_another_fractional_distance(f__, y_1, y_2, y_3, y_4, out_y):
+    """Solve parameter t from s, or vice versa, for one pixel."""
+    y_21 = y_2 - y_1
+    y_43 = y_4 - y_3
+    denominator = y_3 + y_43 * f__ - y_1 - y_21 * f__
+    # The denominator is zero eg. for symmetric trapezoids, which are solved
+    # by the other solvers.  Rounding can leave a tiny value instead of
+    # zero, so reject also values that are tiny compared to the coordinates.
+    if abs(denominator) <= EPSILON * (abs(y_1) + abs(y_2) + abs(y_3) +
+                                      abs(y_4)):
+        return np.nan
+    g__ = (out_y - y_1 - y_21 * f__) / denominator
+    if g__ < 0 or g__ > 1:
+        return np.nan
+    return g__
+
+
+@_jit()
+def _get_ts_parallellogram(x_1, y_1, x_2, y_2, x_3, y_3, out_x, out_y):
+    """Get t and s for one pixel where the corners form a parallellogram."""
+    x_21 = x_2 - x_1
+    x_31 = x_3 - x_1
+    y_21 = y_2 - y_1
+    y_31 = y_3 - y_1
+
+    t__ = ((x_21 * (out_y - y_1) - y_21 * (out_x - x_1)) /
+           (x_21 * y_31 - y_21 * x_31))
+    if t__ < 0. or t__ > 1.:
+        t__ = np.nan
+    s__ = (out_x - x_1 + x_31 * t__) / x_21
+    if s__ < 0. or s__ > 1.:
+        s__ = np.nan
+
+    return t__, s__
@@ -399,7 +399,9 @@ class ImageContainerBilinear(ImageContainer):
                                        neighbours=self.neighbours,
                                        epsilon=self.epsilon,
                                        fill_value=self.fill_value,
-                                       nprocs=self.nprocs,
+                                       nthreads=(self.nprocs
+                                                 if self.nprocs > 1
+                                                 else None),
                                        reduce_data=self.reduce_data,
                                        segments=self.segments)
         try:
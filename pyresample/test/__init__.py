@@ -16,3 +16,17 @@
 # You should have received a copy of the GNU Lesser General Public License along
 # with this program.  If not, see <http://www.gnu.org/licenses/>.
 """The test base."""
+
+import os
+
+# Some tests fork processes with nprocs > 1 after the numba kernels of the
+# bilinear interpolation have started their threads.  The default TBB
+# threading layer hangs at exit in that case, so use a fork-safe layer
+# unless another one has been requested.
+if 'NUMBA_THREADING_LAYER' not in os.environ:
+    try:
+        from numba import config
+    except ImportError:
+        pass
+    else:
+        config.THREADING_LAYER = 'workqueue'
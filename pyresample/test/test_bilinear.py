@@ -12,18 +12,27 @@ class TestNumpyBilinear(unittest.TestCase):
         """Do some setup for the test class."""
         from pyresample import geometry, kd_tree
 
-        cls.pts_irregular = (np.array([[-1., 1.], ]),
-                             np.array([[1., 2.], ]),
-                             np.array([[-2., -1.], ]),
-                             np.array([[2., -4.], ]))
-        cls.pts_vert_parallel = (np.array([[-1., 1.], ]),
-                                 np.array([[1., 2.], ]),
-                                 np.array([[-1., -1.], ]),
-                                 np.array([[1., -2.], ]))
-        cls.pts_both_parallel = (np.array([[-1., 1.], ]),
-                                 np.array([[1., 1.], ]),
-                                 np.array([[-1., -1.], ]),
-                                 np.array([[1., -1.], ]))
+        # Corner coordinates as (x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4)
+        cls.pts_irregular = (np.array([-1.]), np.array([1.]),
+                             np.array([1.]), np.array([2.]),
+                             np.array([-2.]), np.array([-1.]),
+                             np.array([2.]), np.array([-4.]))
+        cls.pts_vert_parallel = (np.array([-1.]), np.array([1.]),
+                                 np.array([1.]), np.array([2.]),
+                                 np.array([-1.]), np.array([-1.]),
+                                 np.array([1.]), np.array([-2.]))
+        cls.pts_both_parallel = (np.array([-1.]), np.array([1.]),
+                                 np.array([1.]), np.array([1.]),
+                                 np.array([-1.]), np.array([-1.]),
+                                 np.array([1.]), np.array([-1.]))
+        cls.pts_trapezoid = (np.array([-9062.70, -9062.70]),
+                             np.array([692709.02, 692709.02]),
+                             np.array([9062.70, 9062.70]),
+                             np.array([692709.02, 692709.02]),
+                             np.array([-9146.95, -9146.95]),
+                             np.array([658836.40, 658836.40]),
+                             np.array([9146.95, 9146.95]),
+                             np.array([658836.40, 658836.40]))
 
         # Area definition with four pixels
         target_def = geometry.AreaDefinition('areaD',
@@ -56,9 +65,6 @@ class TestNumpyBilinear(unittest.TestCase):
             kd_tree.get_neighbour_info(cls.swath_def, target_def,
                                        radius, neighbours=cls.neighbours,
                                        nprocs=1)
-        input_size = input_idxs.sum()
-        index_mask = (idx_ref == input_size)
-        idx_ref = np.where(index_mask, 0, idx_ref)
 
         cls.input_idxs = input_idxs
         cls.target_def = target_def
@@ -69,14 +75,13 @@ class TestNumpyBilinear(unittest.TestCase):
         from pyresample.bilinear import _calc_abc
 
         # No np.nan inputs
-        pt_1, pt_2, pt_3, pt_4 = self.pts_irregular
-        res = _calc_abc(pt_1, pt_2, pt_3, pt_4, 0.0, 0.0)
+        res = _calc_abc(*self.pts_irregular, 0.0, 0.0)
         self.assertFalse(np.isnan(res[0]))
         self.assertFalse(np.isnan(res[1]))
         self.assertFalse(np.isnan(res[2]))
         # np.nan input -> np.nan output
-        res = _calc_abc(np.array([[np.nan, np.nan]]),
-                        pt_2, pt_3, pt_4, 0.0, 0.0)
+        res = _calc_abc(np.array([np.nan]), np.array([np.nan]),
+                        *self.pts_irregular[2:], 0.0, 0.0)
         self.assertTrue(np.isnan(res[0]))
         self.assertTrue(np.isnan(res[1]))
         self.assertTrue(np.isnan(res[2]))
@@ -85,18 +90,10 @@ class TestNumpyBilinear(unittest.TestCase):
         """Test calculations for irregular corner locations."""
         from pyresample.bilinear import _get_ts_irregular
 
-        res = _get_ts_irregular(self.pts_irregular[0],
-                                self.pts_irregular[1],
-                                self.pts_irregular[2],
-                                self.pts_irregular[3],
-                                0., 0.)
+        res = _get_ts_irregular(*self.pts_irregular, 0., 0.)
         self.assertEqual(res[0], 0.375)
         self.assertEqual(res[1], 0.5)
-        res = _get_ts_irregular(self.pts_vert_parallel[0],
-                                self.pts_vert_parallel[1],
-                                self.pts_vert_parallel[2],
-                                self.pts_vert_parallel[3],
-                                0., 0.)
+        res = _get_ts_irregular(*self.pts_vert_parallel, 0., 0.)
         self.assertTrue(np.isnan(res[0]))
         self.assertTrue(np.isnan(res[1]))
 
@@ -104,11 +101,7 @@ class TestNumpyBilinear(unittest.TestCase):
         """Test calculation when uprights are parallel."""
         from pyresample.bilinear import _get_ts_uprights_parallel
 
-        res = _get_ts_uprights_parallel(self.pts_vert_parallel[0],
-                                        self.pts_vert_parallel[1],
-                                        self.pts_vert_parallel[2],
-                                        self.pts_vert_parallel[3],
-                                        0., 0.)
+        res = _get_ts_uprights_parallel(*self.pts_vert_parallel, 0., 0.)
         self.assertEqual(res[0], 0.5)
         self.assertEqual(res[1], 0.5)
 
@@ -116,10 +109,7 @@ class TestNumpyBilinear(unittest.TestCase):
         """Test calculation when the corners form a parallellogram."""
         from pyresample.bilinear import _get_ts_parallellogram
 
-        res = _get_ts_parallellogram(self.pts_both_parallel[0],
-                                     self.pts_both_parallel[1],
-                                     self.pts_both_parallel[2],
-                                     0., 0.)
+        res = _get_ts_parallellogram(*self.pts_both_parallel[:6], 0., 0.)
         self.assertEqual(res[0], 0.5)
         self.assertEqual(res[1], 0.5)
 
@@ -129,28 +119,40 @@ class TestNumpyBilinear(unittest.TestCase):
 
         out_x = np.array([[0.]])
         out_y = np.array([[0.]])
-        res = _get_ts(self.pts_irregular[0],
-                      self.pts_irregular[1],
-                      self.pts_irregular[2],
-                      self.pts_irregular[3],
-                      out_x, out_y)
+        res = _get_ts(*self.pts_irregular, out_x, out_y)
         self.assertEqual(res[0], 0.375)
         self.assertEqual(res[1], 0.5)
-        res = _get_ts(self.pts_both_parallel[0],
-                      self.pts_both_parallel[1],
-                      self.pts_both_parallel[2],
-                      self.pts_both_parallel[3],
-                      out_x, out_y)
+        res = _get_ts(*self.pts_both_parallel, out_x, out_y)
         self.assertEqual(res[0], 0.5)
         self.assertEqual(res[1], 0.5)
-        res = _get_ts(self.pts_vert_parallel[0],
-                      self.pts_vert_parallel[1],
-                      self.pts_vert_parallel[2],
-                      self.pts_vert_parallel[3],
-                      out_x, out_y)
+        res = _get_ts(*self.pts_vert_parallel, out_x, out_y)
         self.assertEqual(res[0], 0.5)
         self.assertEqual(res[1], 0.5)
 
+        # Symmetric trapezoid, where s can't be solved from t
+        t__, s__ = _get_ts(*self.pts_trapezoid, np.array([-9000., 9000.]),
+                           np.array([690000., 690000.]))
+        np.testing.assert_allclose(t__, [0.07997669, 0.07997669], rtol=1e-6)
+        np.testing.assert_allclose(s__, [0.00308749, 0.99616902], rtol=1e-6)
+
+    @mock.patch('pyresample.bilinear._kernels', None)
+    def test_get_ts_numpy(self):
+        """Test get_ts() without numba."""
+        self.test_get_ts()
+
+    def test_get_ts_numba_numpy(self):
+        """Test that get_ts() gives the same results with and without
+        numba for a symmetric trapezoid."""
+        from pyresample.bilinear import _get_ts
+
+        out_x = np.array([-9000., 9000.])
+        out_y = np.array([690000., 690000.])
+        t_1, s_1 = _get_ts(*self.pts_trapezoid, out_x, out_y)
+        with mock.patch('pyresample.bilinear._kernels', None):
+            t_2, s_2 = _get_ts(*self.pts_trapezoid, out_x, out_y)
+        np.testing.assert_allclose(t_1, t_2)
+        np.testing.assert_allclose(s_1, s_2)
+
     def test_solve_quadratic(self):
         """Test solving quadratic equation."""
         from pyresample.bilinear import (_solve_quadratic, _calc_abc)
@@ -161,20 +163,23 @@ class TestNumpyBilinear(unittest.TestCase):
         self.assertTrue(np.isnan(res[0]))
         res = _solve_quadratic(1, 2, 1, min_val=-2.)
         self.assertEqual(res[0], -1.0)
+        # Nearly linear equation without loss of precision
+        res = _solve_quadratic(1e-12, 1., -0.5)
+        self.assertAlmostEqual(res[0], 0.5, 10)
         # Test that small adjustments work
-        pt_1, pt_2, pt_3, pt_4 = self.pts_vert_parallel
-        pt_1 = self.pts_vert_parallel[0].copy()
-        pt_1[0][0] += 1e-7
-        res = _calc_abc(pt_1, pt_2, pt_3, pt_4, 0.0, 0.0)
+        x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4 = self.pts_vert_parallel
+        x_1 = x_1 + 1e-7
+        res = _calc_abc(x_1, y_1, x_2, y_2, x_3, y_3, x_4, y_4, 0.0, 0.0)
         res = _solve_quadratic(res[0], res[1], res[2])
         self.assertAlmostEqual(res[0], 0.5, 5)
-        res = _calc_abc(pt_1, pt_3, pt_2, pt_4, 0.0, 0.0)
+        res = _calc_abc(x_1, y_1, x_3, y_3, x_2, y_2, x_4, y_4, 0.0, 0.0)
         res = _solve_quadratic(res[0], res[1], res[2])
         self.assertAlmostEqual(res[0], 0.5, 5)
 
     def test_get_output_xy(self):
         """Test calculation of output xy-coordinates."""
         from pyresample.bilinear import _get_output_xy
+        from pyresample import geometry
         from pyresample._spatial_mp import Proj
 
         proj = Proj(self.target_def.proj_str)
@@ -182,6 +187,44 @@ class TestNumpyBilinear(unittest.TestCase):
         self.assertTrue(out_x.all())
         self.assertTrue(out_y.all())
 
+        # The projection coordinates match the projected lon/lats
+        lons, lats = self.target_def.get_lonlats()
+        proj_x, proj_y = proj(lons.ravel(), lats.ravel())
+        np.testing.assert_allclose(out_x, proj_x)
+        np.testing.assert_allclose(out_y, proj_y)
+
+        # Area crossing the antimeridian of the projection
+        area_def = geometry.AreaDefinition('merc', 'merc', 'merc',
+                                           {'proj': 'merc', 'lon_0': 0.,
+                                            'ellps': 'WGS84'},
+                                           40, 40,
+                                           [1.7e7, -2e6, 2.1e7, 2e6])
+        proj = Proj(area_def.proj_str)
+        out_x, out_y = _get_output_xy(area_def, proj)
+        lons, lats = area_def.get_lonlats()
+        proj_x, proj_y = proj(lons.ravel(), lats.ravel())
+        np.testing.assert_allclose(out_x, proj_x)
+        np.testing.assert_allclose(out_y, proj_y)
+
+    def test_resample_bilinear_antimeridian(self):
+        """Test resampling to an area crossing the antimeridian."""
+        from pyresample.bilinear import resample_bilinear
+        from pyresample import geometry
+
+        area_def = geometry.AreaDefinition('merc', 'merc', 'merc',
+                                           {'proj': 'merc', 'lon_0': 0.,
+                                            'ellps': 'WGS84'},
+                                           40, 40,
+                                           [1.7e7, -2e6, 2.1e7, 2e6])
+        lons, lats = np.meshgrid(np.linspace(150., 210., 300),
+                                 np.linspace(-25., 25., 200))
+        lons = np.where(lons > 180., lons - 360., lons)
+        swath_def = geometry.SwathDefinition(lons=lons, lats=lats)
+        res = resample_bilinear(np.ones(lons.shape), swath_def, area_def,
+                                50e3, fill_value=None)
+        # Also the columns east of 180 degrees have valid data
+        self.assertEqual(res.count(), area_def.size)
+
     def test_get_input_xy(self):
         """Test calculation of input xy-coordinates."""
         from pyresample.bilinear import _get_input_xy
@@ -193,6 +236,46 @@ class TestNumpyBilinear(unittest.TestCase):
         self.assertTrue(in_x.all())
         self.assertTrue(in_y.all())
 
+    def test_mask_coordinates(self):
+        """Test masking of invalid coordinates."""
+        from pyresample.bilinear import _mask_coordinates
+
+        lons, lats = _mask_coordinates(np.array([-200., 0., 0., 0., 200.]),
+                                       np.array([0., -100., 0, 100., 0.]))
+        self.assertTrue(lons[2] == lats[2] == 0.0)
+        self.assertEqual(np.sum(np.isnan(lons)), 4)
+        self.assertEqual(np.sum(np.isnan(lats)), 4)
+
+        # Integer coordinates
+        lons, lats = _mask_coordinates(np.array([-200, 0, 0, 0, 200]),
+                                       np.array([0, -100, 0, 100, 0]))
+        self.assertTrue(lons[2] == lats[2] == 0.0)
+        self.assertEqual(np.sum(np.isnan(lons)), 4)
+        self.assertEqual(np.sum(np.isnan(lats)), 4)
+
+        # Coordinates in non-native byte order
+        dtype = np.dtype(np.float32).newbyteorder()
+        lons, lats = _mask_coordinates(
+            np.array([-200., 0., 0., 0., 200.], dtype=dtype),
+            np.array([0., -100., 0, 100., 0.], dtype=dtype))
+        self.assertTrue(lons.dtype.isnative)
+        self.assertEqual(lons.dtype, np.float32)
+        self.assertTrue(lons[2] == lats[2] == 0.0)
+        self.assertEqual(np.sum(np.isnan(lons)), 4)
+        self.assertEqual(np.sum(np.isnan(lats)), 4)
+
+        # Masked coordinates
+        lons, lats = _mask_coordinates(
+            np.ma.masked_array([-200., 0., 0., 0., 200.],
+                               mask=[False, False, True, False, False]),
+            np.array([0., -100., 0, 100., 0.]))
+        self.assertEqual(lons.mask.sum(), 5)
+
+    @mock.patch('pyresample.bilinear._kernels', None)
+    def test_mask_coordinates_numpy(self):
+        """Test masking of invalid coordinates without numba."""
+        self.test_mask_coordinates()
+
     def test_get_bounding_corners(self):
         """Test calculation of bounding corners."""
         from pyresample.bilinear import (_get_output_xy,
@@ -207,10 +290,25 @@ class TestNumpyBilinear(unittest.TestCase):
         res = _get_bounding_corners(in_x, in_y, out_x, out_y,
                                     self.neighbours, self.idx_ref)
         for i in range(len(res) - 1):
-            pt_ = res[i]
-            for j in range(2):
-                # Only the sixth output location has four valid corners
-                self.assertTrue(np.isfinite(pt_[5, j]))
+            # Only the sixth output location has four valid corners
+            self.assertTrue(np.isfinite(res[i][5]))
+
+        # The lower right corner is missing, and it gets the index of the
+        # closest neighbour instead of an arbitrary one
+        in_x = np.array([[-1., 1., -2., np.nan]])
+        in_y = np.array([[2., 2., -2., np.nan]])
+        idx_ref = np.array([[7, 3, 5, 9]])
+        res = _get_bounding_corners(in_x, in_y, np.array([0.]),
+                                    np.array([0.]), 4, idx_ref)
+        np.testing.assert_equal(np.ravel(res[:6]), [-1., 2., 1., 2., -2., -2.])
+        self.assertTrue(np.isnan(res[6]))
+        self.assertTrue(np.isnan(res[7]))
+        np.testing.assert_equal(res[8], [[7, 3, 5, 7]])
+
+    @mock.patch('pyresample.bilinear._kernels', None)
+    def test_get_bounding_corners_numpy(self):
+        """Test calculation of bounding corners without numba."""
+        self.test_get_bounding_corners()
 
     def test_get_bil_info(self):
         """Test calculation of bilinear resampling indices."""
@@ -247,6 +345,33 @@ class TestNumpyBilinear(unittest.TestCase):
                                                      reduce_data=True)
         _check_ts(t__, s__)
 
+        # Single precision
+        t__, s__, input_idxs, idx_arr = get_bil_info(self.swath_def,
+                                                     self.target_def,
+                                                     50e5, neighbours=32,
+                                                     nprocs=1,
+                                                     dtype=np.float32)
+        self.assertEqual(t__.dtype, np.float32)
+        self.assertEqual(s__.dtype, np.float32)
+        self.assertAlmostEqual(t__[5], 0.730659147133, 4)
+        self.assertAlmostEqual(s__[5], 0.310314173004, 4)
+
+    def test_get_bil_info_nprocs(self):
+        """Test that no processes are forked for the neighbour search."""
+        from pyresample import kd_tree
+        from pyresample.bilinear import get_bil_info
+
+        with mock.patch('pyresample.bilinear.kd_tree.get_neighbour_info',
+                        wraps=kd_tree.get_neighbour_info) as get_info:
+            with self.assertWarns(DeprecationWarning):
+                get_bil_info(self.swath_def, self.target_def, 50e5, nprocs=2)
+        self.assertEqual(get_info.call_args[1]['nprocs'], 1)
+
+    @mock.patch('pyresample.bilinear._kernels', None)
+    def test_get_bil_info_numpy(self):
+        """Test calculation of bilinear resampling indices without numba."""
+        self.test_get_bil_info()
+
     def test_get_sample_from_bil_info(self):
         """Test resampling using resampling indices."""
         from pyresample.bilinear import get_bil_info, get_sample_from_bil_info
@@ -263,6 +388,11 @@ class TestNumpyBilinear(unittest.TestCase):
         res = get_sample_from_bil_info(self.data2.ravel(), t__, s__,
                                        input_idxs, idx_arr)
         self.assertEqual(res[5], 2.)
+        # Data in non-native byte order
+        data = self.data2.ravel()
+        res = get_sample_from_bil_info(data.astype(data.dtype.newbyteorder()),
+                                       t__, s__, input_idxs, idx_arr)
+        self.assertEqual(res[5], 2.)
         # Reshaping
         res = get_sample_from_bil_info(self.data2.ravel(), t__, s__,
                                        input_idxs, idx_arr,
@@ -278,9 +408,33 @@ class TestNumpyBilinear(unittest.TestCase):
         # Four pixels are outside of the data
         self.assertEqual(np.isnan(res).sum(), 4)
 
+        # Use an existing output array
+        out = np.zeros(t__.shape)
+        res = get_sample_from_bil_info(self.data2.ravel(), t__, s__,
+                                       input_idxs, idx_arr, out=out)
+        self.assertIs(res, out)
+        self.assertEqual(out[5], 2.)
+
+        # The result type follows both the data and the fractional
+        # distances
+        data = self.data2.ravel().astype(np.float32)
+        res = get_sample_from_bil_info(data, t__, s__, input_idxs, idx_arr)
+        self.assertEqual(res.dtype, np.float64)
+        res = get_sample_from_bil_info(data, t__.astype(np.float32),
+                                       s__.astype(np.float32), input_idxs,
+                                       idx_arr)
+        self.assertEqual(res.dtype, np.float32)
+        self.assertEqual(res[5], 2.)
+
+    @mock.patch('pyresample.bilinear._kernels', None)
+    def test_get_sample_from_bil_info_numpy(self):
+        """Test resampling using resampling indices without numba."""
+        self.test_get_sample_from_bil_info()
+
     def test_resample_bilinear(self):
         """Test whole bilinear resampling."""
         from pyresample.bilinear import resample_bilinear
+        from pyresample import geometry
 
         # Single array
         res = resample_bilinear(self.data1,
@@ -293,6 +447,15 @@ class TestNumpyBilinear(unittest.TestCase):
         self.assertEqual(res.sum(), 12)
         self.assertEqual((res == 0).sum(), 4)
 
+        # Single array with another fill value
+        res = resample_bilinear(self.data1,
+                                self.swath_def,
+                                self.target_def,
+                                50e5, neighbours=32,
+                                nprocs=1, fill_value=-1.)
+        self.assertEqual(res.sum(), 8)
+        self.assertEqual((res == -1).sum(), 4)
+
         # Single array with masked output
         res = resample_bilinear(self.data1,
                                 self.swath_def,
@@ -311,6 +474,175 @@ class TestNumpyBilinear(unittest.TestCase):
         shp = res.shape
         self.assertEqual(shp[0:2], self.target_def.shape)
         self.assertEqual(shp[-1], 2)
+        # The channels are interpolated independently
+        for i, chan in enumerate((self.data1, self.data2)):
+            np.testing.assert_array_equal(
+                res[:, :, i],
+                resample_bilinear(chan, self.swath_def, self.target_def))
+        # Non-contiguous data and data in non-native byte order
+        for data2 in (np.asfortranarray(data),
+                      data.astype(data.dtype.newbyteorder())):
+            np.testing.assert_array_equal(
+                resample_bilinear(data2, self.swath_def, self.target_def),
+                res)
+        # Source coordinates in non-native byte order
+        dtype = self.swath_def.lons.dtype.newbyteorder()
+        swath_def = geometry.SwathDefinition(
+            lons=self.swath_def.lons.astype(dtype),
+            lats=self.swath_def.lats.astype(dtype))
+        np.testing.assert_array_equal(
+            resample_bilinear(data, swath_def, self.target_def), res)
+
+        # Use an existing output array
+        out = np.zeros(self.target_def.shape + (2,))
+        res2 = resample_bilinear(data,
+                                 self.swath_def,
+                                 self.target_def,
+                                 out=out)
+        self.assertTrue(np.shares_memory(res2, out))
+        np.testing.assert_array_equal(out, res)
+        with self.assertRaises(ValueError):
+            resample_bilinear(data, self.swath_def, self.target_def,
+                              out=np.zeros((2,) + self.target_def.shape).T)
+
+    def test_use_numba(self):
+        """Test the selection between the numba kernels and numpy."""
+        from pyresample import bilinear
+
+        arr = np.zeros(3)
+        self.assertEqual(bilinear._use_numba(arr, arr.astype(np.int32)),
+                         bilinear._kernels is not None)
+        self.assertFalse(bilinear._use_numba(arr, np.ma.masked_array(arr)))
+        self.assertFalse(bilinear._use_numba(
+            arr, arr.astype(arr.dtype.newbyteorder())))
+        self.assertFalse(bilinear._use_numba(arr.astype(object)))
+        with mock.patch('pyresample.bilinear._kernels', None):
+            self.assertFalse(bilinear._use_numba(arr))
+
+    @mock.patch('pyresample.bilinear._kernels', None)
+    def test_resample_bilinear_numpy(self):
+        """Test whole bilinear resampling without numba."""
+        self.test_resample_bilinear()
+
+    def test_resample_bilinear_cached(self):
+        """Test that the resampling information is re-used."""
+        from pyresample import bilinear, geometry
+
+        bilinear._get_cached_bil_info.cache_clear()
+        with mock.patch('pyresample.bilinear.get_bil_info',
+                        wraps=bilinear.get_bil_info) as get_bil_info:
+            res1 = bilinear.resample_bilinear(self.data1, self.swath_def,
+                                              self.target_def, 50e5,
+                                              cache=True)
+            res2 = bilinear.resample_bilinear(self.data2, self.swath_def,
+                                              self.target_def, 50e5,
+                                              cache=True)
+            get_bil_info.assert_called_once()
+            # Different parameters are cached separately
+            bilinear.resample_bilinear(self.data1, self.swath_def,
+                                       self.target_def, 50e4, cache=True)
+            self.assertEqual(get_bil_info.call_count, 2)
+            # Nothing is cached by default
+            bilinear.resample_bilinear(self.data1, self.swath_def,
+                                       self.target_def, 50e5)
+            self.assertEqual(get_bil_info.call_count, 3)
+        self.assertEqual(bilinear._get_cached_bil_info.cache_info().currsize,
+                         2)
+        np.testing.assert_array_equal(2 * res1, res2)
+        bilinear._get_cached_bil_info.cache_clear()
+
+        # Geometries that can't be hashed aren't cached
+        swath_def = geometry.SwathDefinition(lons=self.swath_def.lons.T,
+                                             lats=self.swath_def.lats.T)
+        res = bilinear.resample_bilinear(self.data1.T, swath_def,
+                                         self.target_def, 50e5, cache=True)
+        np.testing.assert_array_equal(res, res1)
+        self.assertEqual(bilinear._get_cached_bil_info.cache_info().currsize,
+                         0)
+
+        # Use explicitly given resampling information
+        bil_info = bilinear.get_bil_info(self.swath_def, self.target_def,
+                                         50e5)
+        with mock.patch('pyresample.bilinear._get_cached_bil_info') as cached:
+            res = bilinear.resample_bilinear(self.data1, self.swath_def,
+                                             self.target_def,
+                                             precomputed=bil_info)
+            cached.assert_not_called()
+        np.testing.assert_array_equal(res, res1)
+
+    def test_resample_bilinear_nthreads(self):
+        """Test setting the number of threads for the numba kernels."""
+        from pyresample import bilinear
+
+        if bilinear._kernels is None:
+            self.skipTest("numba is not available")
+        previous = bilinear._kernels.get_num_threads()
+        res1 = bilinear.resample_bilinear(self.data1, self.swath_def,
+                                          self.target_def, 50e5)
+        with mock.patch('pyresample.bilinear._kernels.set_num_threads') as \
+                set_num_threads:
+            res2 = bilinear.resample_bilinear(self.data1, self.swath_def,
+                                              self.target_def, 50e5,
+                                              nthreads=1)
+        set_num_threads.assert_has_calls([mock.call(1), mock.call(previous)])
+        np.testing.assert_array_equal(res1, res2)
+
+        # The deprecated nprocs is used as the number of threads
+        with mock.patch('pyresample.bilinear._kernels.set_num_threads') as \
+                set_num_threads:
+            with self.assertWarns(DeprecationWarning):
+                res2 = bilinear.resample_bilinear(self.data1, self.swath_def,
+                                                  self.target_def, 50e5,
+                                                  nprocs=2)
+        nthreads = min(2, bilinear._kernels.config.NUMBA_NUM_THREADS)
+        set_num_threads.assert_has_calls([mock.call(nthreads),
+                                          mock.call(previous)])
+        np.testing.assert_array_equal(res1, res2)
+
+        # The number of threads is limited to the threads numba has started
+        with bilinear._kernels.num_threads(10000):
+            self.assertEqual(bilinear._kernels.get_num_threads(),
+                             bilinear._kernels.config.NUMBA_NUM_THREADS)
+        self.assertEqual(bilinear._kernels.get_num_threads(), previous)
+
+    def test_resample_bilinear_nprocs_exit(self):
+        """Test that the process exits after resampling with nprocs > 1.
+
+        No processes are forked, so this works also with the default
+        threading layer of numba.
+        """
+        import os
+        import subprocess
+        import sys
+        import pyresample
+
+        script = "\n".join([
+            "import numpy as np",
+            "from pyresample import geometry",
+            "from pyresample.bilinear import resample_bilinear",
+            "area_def = geometry.AreaDefinition(",
+            "    'areaD', 'areaD', 'areaD',",
+            "    {'proj': 'stere', 'lat_0': 50., 'lon_0': 8.,",
+            "     'ellps': 'WGS84'},",
+            "    50, 50, [-1e6, -1e6, 1e6, 1e6])",
+            "lons, lats = np.meshgrid(np.linspace(-10., 25., 100),",
+            "                         np.linspace(40., 60., 100))",
+            "swath_def = geometry.SwathDefinition(lons=lons, lats=lats)",
+            "data = np.ones(lons.shape)",
+            "resample_bilinear(data, swath_def, area_def, 50e3, nprocs=2)",
+            "swath_def = geometry.SwathDefinition(lons=lons + 1.,",
+            "                                     lats=lats)",
+            "resample_bilinear(data, swath_def, area_def, 50e3, nprocs=2)",
+        ])
+        env = dict(os.environ)
+        env.pop('NUMBA_THREADING_LAYER', None)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [os.path.dirname(os.path.dirname(pyresample.__file__))] +
+            [path for path in [env.get('PYTHONPATH')] if path])
+        proc = subprocess.run([sys.executable, '-c', script], env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              timeout=120)
+        self.assertEqual(proc.returncode, 0, proc.stderr.decode())
 
 
 class TestXarrayBilinear(unittest.TestCase):
@@ -867,24 +1199,24 @@ class TestXarrayBilinear(unittest.TestCase):
 
     def test_get_ts_uprights_parallel(self):
         """Test calculation when uprights are parallel."""
-        from pyresample.bilinear import _get_ts_uprights_parallel
+        from pyresample.bilinear.xarr import _get_ts_uprights_parallel_dask
 
-        res = _get_ts_uprights_parallel(self.pts_vert_parallel[0],
-                                        self.pts_vert_parallel[1],
-                                        self.pts_vert_parallel[2],
-                                        self.pts_vert_parallel[3],
-                                        0., 0.)
+        res = _get_ts_uprights_parallel_dask(self.pts_vert_parallel[0],
+                                             self.pts_vert_parallel[1],
+                                             self.pts_vert_parallel[2],
+                                             self.pts_vert_parallel[3],
+                                             0., 0.)
         self.assertEqual(res[0], 0.5)
         self.assertEqual(res[1], 0.5)
 
     def test_get_ts_parallellogram(self):
         """Test calculation when the corners form a parallellogram."""
-        from pyresample.bilinear import _get_ts_parallellogram
+        from pyresample.bilinear.xarr import _get_ts_parallellogram_dask
 
-        res = _get_ts_parallellogram(self.pts_both_parallel[0],
-                                     self.pts_both_parallel[1],
-                                     self.pts_both_parallel[2],
-                                     0., 0.)
+        res = _get_ts_parallellogram_dask(self.pts_both_parallel[0],
+                                          self.pts_both_parallel[1],
+                                          self.pts_both_parallel[2],
+                                          0., 0.)
         self.assertEqual(res[0], 0.5)
         self.assertEqual(res[1], 0.5)
 
@@ -246,5 +246,22 @@ class Test(unittest.TestCase):
         area_con = swath_con.resample(self.area_def)
         res = area_con.image_data
         cross_sum = res.sum()
-        expected = 16852120.789503865
+        expected = 16852120.789500654
+        self.assertAlmostEqual(cross_sum, expected)
+
+    def test_bilinear_swath_nprocs(self):
+        import warnings
+        data = numpy.fromfunction(lambda y, x: y * x, (50, 10))
+        lons = numpy.fromfunction(lambda y, x: 3 + x, (50, 10))
+        lats = numpy.fromfunction(lambda y, x: 75 - y, (50, 10))
+        swath_def = geometry.SwathDefinition(lons=lons, lats=lats)
+        swath_con = image.ImageContainerBilinear(data, swath_def, 500000,
+                                                 segments=1, neighbours=8,
+                                                 nprocs=2)
+        with warnings.catch_warnings():
+            # nprocs is passed to the bilinear functions as nthreads
+            warnings.simplefilter('error', DeprecationWarning)
+            area_con = swath_con.resample(self.area_def)
+        cross_sum = area_con.image_data.sum()
+        expected = 16852120.789500654
         self.assertAlmostEqual(cross_sum, expected)
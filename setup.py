@@ -29,12 +29,13 @@ from setuptools.command.build_ext import build_ext as _build_ext
 requirements = ['setuptools>=3.2', 'pyproj>=1.9.5.1', 'configobj',
                 'pykdtree>=1.3.1', 'pyyaml', 'numpy>=1.10.0']
 extras_require = {'numexpr': ['numexpr'],
+                  'numba': ['numba'],
                   'quicklook': ['matplotlib', 'cartopy', 'pillow'],
                   'rasterio': ['rasterio'],
                   'dask': ['dask>=0.16.1']}
 
 setup_requires = ['numpy>=1.10.0']
-test_requires = ['rasterio', 'dask', 'xarray', 'cartopy', 'pillow', 'matplotlib', 'scipy']
+test_requires = ['rasterio', 'dask', 'xarray', 'cartopy', 'pillow', 'matplotlib', 'scipy', 'numba']
 
 if sys.platform.startswith("win"):
     extra_compile_args = []